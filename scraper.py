@@ -4,6 +4,14 @@ import time
 import os
 import sys
 import smtplib
+import threading
+import queue
+import uuid
+import re
+import bisect
+import gzip
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
 import requests
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -13,6 +21,20 @@ from playwright.sync_api import sync_playwright
 # Check for test mode
 TEST_MODE = "--test" in sys.argv
 TEST_EMAIL = "--test-email" in sys.argv
+PIPELINE_MODE = "--pipeline" in sys.argv
+DISCOVER_MODE = "--discover" in sys.argv
+SEARCH_MODE = len(sys.argv) > 1 and sys.argv[1] == "search"
+NOTIFY_COMMAND = len(sys.argv) > 1 and sys.argv[1] == "notify"
+
+# Notification outbox (pending email / Notion deliveries survive between runs)
+OUTBOX_FILE = "outbox_test.json" if TEST_MODE else "outbox.json"
+OUTBOX_MAX_ATTEMPTS = 3
+OUTBOX_RETRY_DELAY = 10
+OUTBOX_WORKERS = 2
+# URLs already added to Notion, so re-sent products don't become duplicate pages
+NOTION_SYNCED_FILE = "notion_synced_test.json" if TEST_MODE else "notion_synced.json"
+# How long a scrape run waits for deliveries before leaving them for next time
+OUTBOX_WAIT_TIMEOUT = 60
 
 # Notion configuration
 NOTION_API_KEY = os.environ.get('NOTION_API_KEY')
@@ -20,6 +42,18 @@ NOTION_DATABASE_ID = os.environ.get('NOTION_DATABASE_ID', '2ed576a5c12d803a9025f
 
 BASE_URL = "https://www.carrierenterprise.com"
 
+# Sitemap used by --discover (an http(s) URL or a local file, .xml or .xml.gz)
+SITEMAP_URL = os.environ.get('SITEMAP_URL', f"{BASE_URL}/sitemap.xml")
+SITEMAP_CACHE_FILE = "sitemap_cache.json"
+# More new URLs than this and opening each product page costs more than a full crawl
+DISCOVER_MAX_NEW_URLS = 100
+
+# On-disk search index over the latest snapshot, used by `search`
+SEARCH_INDEX_FILE = "search_index_test.json" if TEST_MODE else "search_index.json"
+SEARCH_INDEX_VERSION = 3
+# Fields that, when changed, mean a product has to be re-indexed
+SEARCH_INDEX_FIELDS = ("name", "item_code", "mfr_code", "category")
+
 CATEGORIES = {
     "Residential - Air Conditioners": "1423187165527",
     "Residential - Boilers": "1423187165556",
@@ -128,14 +162,19 @@ def scrape_category(page, category_name, category_id, products, max_pages=None):
         page_num += 1
     return category_count
 
-def get_previous_file(current_filename):
-    """Find the most recent products file that's not the current one"""
+def list_snapshot_files():
+    """Dated products files for this mode, oldest first"""
     # In test mode, only compare with other test files
     if TEST_MODE:
         files = [f for f in os.listdir('.') if f.startswith('products_test_') and f.endswith('.json')]
     else:
         # In normal mode, exclude test files
         files = [f for f in os.listdir('.') if f.startswith('products_') and f.endswith('.json') and '_test_' not in f]
+    return sorted(files)
+
+def get_previous_file(current_filename):
+    """Find the most recent products file that's not the current one"""
+    files = list_snapshot_files()
     files.sort(reverse=True)
     for f in files:
         if f != current_filename:
@@ -161,16 +200,24 @@ def compare_products(old_file, new_products):
     
     return {"added": added, "removed": removed, "old_count": len(old_products)}
 
-def generate_report(changes, new_count, date_str):
-    """Generate a text report of changes"""
+def generate_report(changes, new_count, date_str, partial_note=None):
+    """Generate a text report of changes
+
+    A `partial_note` marks a failed run: it's shown up top and the net
+    change is left out, since the count only covers part of the catalog.
+    """
     report = []
     report.append("=" * 60)
     report.append(f"CARRIER ENTERPRISE SCRAPE REPORT - {date_str}")
     report.append("=" * 60)
     report.append("")
+    if partial_note:
+        report.append(f"PARTIAL RUN: {partial_note}")
+        report.append("")
     report.append(f"Total products scraped: {new_count}")
     report.append(f"Previous count: {changes['old_count']}")
-    report.append(f"Net change: {new_count - changes['old_count']:+d}")
+    if not partial_note:
+        report.append(f"Net change: {new_count - changes['old_count']:+d}")
     report.append("")
     report.append(f"NEW PRODUCTS ADDED: {len(changes['added'])}")
     report.append("-" * 40)
@@ -192,7 +239,7 @@ def generate_report(changes, new_count, date_str):
     return "\n".join(report)
 
 
-def generate_html_email(changes, new_count, date_str):
+def generate_html_email(changes, new_count, date_str, partial_note=None):
     """Generate a nicely formatted HTML email for new products"""
     added = changes.get('added', [])
     removed = changes.get('removed', [])
@@ -227,13 +274,21 @@ def generate_html_email(changes, new_count, date_str):
         .badge {{ display: inline-block; background: #28a745; color: white; padding: 2px 8px; border-radius: 4px; font-size: 11px; margin-left: 10px; }}
         .badge-removed {{ background: #dc3545; }}
         .category-count {{ color: #666; font-size: 14px; }}
+        .partial {{ background: #fff3cd; border: 1px solid #ffc107; color: #856404; padding: 12px; border-radius: 8px; margin: 20px 0; }}
         .footer {{ margin-top: 40px; padding-top: 20px; border-top: 1px solid #ddd; color: #999; font-size: 12px; }}
     </style>
 </head>
 <body>
     <h1>🔧 Carrier Enterprise Weekly Report</h1>
     <p style="color: #666;">Report generated on {date_str}</p>
+"""
+
+    if partial_note:
+        html += f"""
+    <div class="partial">⚠️ <strong>Partial run:</strong> {partial_note}</div>
+"""
 
+    html += f"""
     <div class="summary">
         <div class="summary-item">
             <div class="number">{new_count:,}</div>
@@ -247,10 +302,15 @@ def generate_html_email(changes, new_count, date_str):
             <div class="number" style="color: #dc3545;">-{len(removed):,}</div>
             <div class="label">Removed</div>
         </div>
+"""
+    if not partial_note:
+        html += f"""
         <div class="summary-item">
             <div class="number">{new_count - old_count:+,}</div>
             <div class="label">Net Change</div>
         </div>
+"""
+    html += """
     </div>
 """
 
@@ -314,7 +374,7 @@ def generate_html_email(changes, new_count, date_str):
     return html
 
 
-def send_email_report(changes, new_count, date_str, text_report):
+def send_email_report(changes, new_count, date_str, text_report, partial_note=None):
     """Send email report of new products"""
     email_user = os.environ.get('EMAIL_USER')
     email_pass = os.environ.get('EMAIL_PASS')
@@ -328,6 +388,8 @@ def send_email_report(changes, new_count, date_str, text_report):
     try:
         msg = MIMEMultipart('alternative')
         msg['Subject'] = f"🔧 Carrier Enterprise Report - {len(changes.get('added', []))} New Products ({date_str})"
+        if partial_note:
+            msg['Subject'] = f"⚠️ PARTIAL {msg['Subject']}"
         msg['From'] = email_user
         msg['To'] = email_to
 
@@ -336,7 +398,7 @@ def send_email_report(changes, new_count, date_str, text_report):
         msg.attach(text_part)
 
         # HTML version
-        html_content = generate_html_email(changes, new_count, date_str)
+        html_content = generate_html_email(changes, new_count, date_str, partial_note)
         html_part = MIMEText(html_content, 'html')
         msg.attach(html_part)
 
@@ -354,8 +416,13 @@ def send_email_report(changes, new_count, date_str, text_report):
         return False
 
 
-def add_to_notion(products, date_str):
-    """Add new products to Notion database"""
+def add_to_notion(products, date_str, failed=None, on_added=None):
+    """Add new products to Notion database
+
+    If a `failed` list is given, products that could not be added are
+    appended to it so only those need to be retried. `on_added` is called
+    with each product as soon as its page has been created.
+    """
     if not NOTION_API_KEY:
         print("Notion API key not configured. Skipping Notion sync.")
         print("Set NOTION_API_KEY environment variable to enable Notion integration.")
@@ -412,18 +479,25 @@ def add_to_notion(products, date_str):
             response = requests.post(
                 "https://api.notion.com/v1/pages",
                 headers=headers,
-                json=page_data
+                json=page_data,
+                timeout=30
             )
 
             if response.status_code == 200:
                 success_count += 1
+                if on_added:
+                    on_added(product)
             else:
                 fail_count += 1
+                if failed is not None:
+                    failed.append(product)
                 print(f"  Failed to add {product.get('item_code', 'unknown')}: {response.status_code}")
                 if fail_count <= 3:  # Only show first few errors
                     print(f"    Response: {response.text[:200]}")
         except Exception as e:
             fail_count += 1
+            if failed is not None:
+                failed.append(product)
             print(f"  Error adding {product.get('item_code', 'unknown')}: {e}")
 
         # Small delay to avoid rate limiting
@@ -433,20 +507,244 @@ def add_to_notion(products, date_str):
     return fail_count == 0
 
 
-def scrape_all_products():
-    products = []
+_outbox_lock = threading.Lock()
+
+
+def load_outbox():
+    """Load pending notifications from the outbox file"""
+    if not os.path.exists(OUTBOX_FILE):
+        return []
+    with open(OUTBOX_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_outbox(entries):
+    """Write the outbox atomically so a crash never leaves a truncated file"""
+    tmp_file = OUTBOX_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_file, OUTBOX_FILE)
+
+
+def enqueue_notification(kind, payload):
+    """Record a pending delivery ("email" or "notion") in the outbox"""
+    entry = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "payload": payload,
+        "attempts": 0,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "last_error": None,
+    }
+    with _outbox_lock:
+        entries = load_outbox()
+        entries.append(entry)
+        save_outbox(entries)
+    return entry
+
+
+def update_outbox_entry(entry_id, **fields):
+    """Update fields of an outbox entry (no-op if it's already gone)"""
+    with _outbox_lock:
+        entries = load_outbox()
+        for entry in entries:
+            if entry["id"] == entry_id:
+                entry.update(fields)
+                break
+        save_outbox(entries)
+
+
+def remove_outbox_entry(entry_id):
+    """Drop a delivered entry from the outbox"""
+    with _outbox_lock:
+        entries = [e for e in load_outbox() if e["id"] != entry_id]
+        save_outbox(entries)
+
+
+def queue_notifications(changes, new_count, date_str, text_report,
+                        include_email=True, include_notion=True, partial_note=None):
+    """Put this run's email and Notion deliveries in the outbox"""
+    entries = []
+    if include_email:
+        if os.environ.get('EMAIL_USER') and os.environ.get('EMAIL_PASS'):
+            entries.append(enqueue_notification("email", {
+                "changes": changes,
+                "new_count": new_count,
+                "date_str": date_str,
+                "text_report": text_report,
+                "partial_note": partial_note,
+            }))
+        else:
+            print("Email credentials not configured. Skipping email notification.")
+            print("Set EMAIL_USER and EMAIL_PASS environment variables to enable email.")
+
+    if include_notion and changes.get('added'):
+        if NOTION_API_KEY:
+            entries.append(enqueue_notification("notion", {
+                "products": changes['added'],
+                "date_str": date_str,
+            }))
+        else:
+            print("Notion API key not configured. Skipping Notion sync.")
+            print("Set NOTION_API_KEY environment variable to enable Notion integration.")
+    return entries
+
+
+_notion_synced_lock = threading.Lock()
+
+
+def load_notion_synced():
+    """{url: date} of products already added to Notion by the outbox"""
+    with _notion_synced_lock:
+        if not os.path.exists(NOTION_SYNCED_FILE):
+            return {}
+        with open(NOTION_SYNCED_FILE, "r") as f:
+            return json.load(f)
+
+
+def record_notion_synced(product, date_str):
+    """Mark one product as added, atomically so a killed run can't truncate the file"""
+    with _notion_synced_lock:
+        synced = {}
+        if os.path.exists(NOTION_SYNCED_FILE):
+            with open(NOTION_SYNCED_FILE, "r") as f:
+                synced = json.load(f)
+        synced[product['url']] = date_str
+        tmp_file = NOTION_SYNCED_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(synced, f, indent=2)
+        os.replace(tmp_file, NOTION_SYNCED_FILE)
+
+
+def deliver_notification(entry):
+    """Attempt a single delivery. Returns (success, remaining_payload)"""
+    payload = entry["payload"]
+    if entry["kind"] == "email":
+        success = send_email_report(payload["changes"], payload["new_count"],
+                                    payload["date_str"], payload["text_report"],
+                                    payload.get("partial_note"))
+        return success, payload
+    if entry["kind"] == "notion":
+        # A failed pipeline run re-finds the same new products next time
+        synced = load_notion_synced()
+        products = [p for p in payload["products"] if p['url'] not in synced]
+        skipped = len(payload["products"]) - len(products)
+        if skipped:
+            print(f"  Skipping {skipped} product(s) already in Notion")
+        if not products:
+            return True, dict(payload, products=[])
+        failed = []
+        # Recorded per product: the run may end (and kill this thread) mid-batch
+        success = add_to_notion(products, payload["date_str"], failed=failed,
+                                on_added=lambda p: record_notion_synced(p, payload["date_str"]))
+        if not success and not failed:
+            # The sync never ran (e.g. no API key), so everything is still pending
+            return False, payload
+        # Only the products that failed need to go out again
+        return success, dict(payload, products=failed)
+    print(f"  Unknown notification kind: {entry['kind']}")
+    return False, payload
+
+
+def _outbox_worker(work):
+    while True:
+        try:
+            entry = work.get_nowait()
+        except queue.Empty:
+            return
+        attempts = entry.get("attempts", 0)
+        while attempts < OUTBOX_MAX_ATTEMPTS:
+            attempts += 1
+            try:
+                success, payload = deliver_notification(entry)
+                error = None if success else "delivery failed"
+            except Exception as e:
+                success, payload, error = False, entry["payload"], str(e)
+            if success:
+                remove_outbox_entry(entry["id"])
+                break
+            entry["payload"] = payload
+            update_outbox_entry(entry["id"], attempts=attempts,
+                                payload=payload, last_error=error)
+            if attempts < OUTBOX_MAX_ATTEMPTS:
+                print(f"  {entry['kind']} delivery failed, retrying in {OUTBOX_RETRY_DELAY * attempts}s "
+                      f"({attempts}/{OUTBOX_MAX_ATTEMPTS})...")
+                time.sleep(OUTBOX_RETRY_DELAY * attempts)
+        else:
+            print(f"  {entry['kind']} delivery still failing after {attempts} attempts, "
+                  f"left in {OUTBOX_FILE} (retry with: python scraper.py notify --drain)")
+
+
+def start_outbox_workers(entries=None, num_workers=OUTBOX_WORKERS):
+    """Start background threads that deliver outbox entries with retries
 
+    Delivers the whole outbox by default, or only the given entries.
+    """
+    if entries is None:
+        entries = load_outbox()
+    work = queue.Queue()
+    for entry in entries:
+        # Entries that already used up their attempts get a fresh set on a new run
+        entry["attempts"] = 0
+        work.put(entry)
+    if work.empty():
+        return []
+    print(f"\nDelivering {work.qsize()} pending notification(s) in the background...")
+    workers = []
+    for _ in range(min(num_workers, work.qsize())):
+        # Daemon threads: whatever isn't delivered when the run ends stays in the outbox
+        t = threading.Thread(target=_outbox_worker, args=(work,), daemon=True)
+        t.start()
+        workers.append(t)
+    return workers
+
+
+def wait_for_outbox(workers, timeout=OUTBOX_WAIT_TIMEOUT):
+    """Wait (up to `timeout` seconds, None for no limit) for background deliveries"""
+    deadline = time.time() + timeout if timeout is not None else None
+    for t in workers:
+        t.join(None if deadline is None else max(0, deadline - time.time()))
+    remaining = load_outbox()
+    if remaining:
+        print(f"{len(remaining)} notification(s) still pending in {OUTBOX_FILE} "
+              f"(retry with: python scraper.py notify --drain)")
+    elif workers:
+        print("All notifications delivered.")
+    return not remaining
+
+
+def drain_outbox():
+    """Retry notifications left over from earlier runs"""
+    print(f"Draining notification outbox: {OUTBOX_FILE}")
+    workers = start_outbox_workers()
+    if not workers:
+        print("Outbox is empty, nothing to deliver.")
+        return True
+    return wait_for_outbox(workers, timeout=None)
+
+
+def get_categories_to_scrape():
+    """Return (categories, max_pages) for this run"""
     # In test mode, only scrape 2 categories with 1 page each
     if TEST_MODE:
         print("\n" + "="*50)
         print("TEST MODE ENABLED")
         print("Scraping only 2 categories with 1 page each")
         print("="*50)
-        categories_to_scrape = dict(list(CATEGORIES.items())[:2])
-        max_pages = 1
-    else:
-        categories_to_scrape = CATEGORIES
-        max_pages = None
+        return dict(list(CATEGORIES.items())[:2]), 1
+    return CATEGORIES, None
+
+
+def get_dated_filenames(date_str):
+    """Return (products file, report file) names for a run date"""
+    if TEST_MODE:
+        return f"products_test_{date_str}.json", f"report_test_{date_str}.txt"
+    return f"products_{date_str}.json", f"report_{date_str}.txt"
+
+
+def scrape_all_products():
+    products = []
+    categories_to_scrape, max_pages = get_categories_to_scrape()
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
@@ -459,49 +757,605 @@ def scrape_all_products():
             print(f"  Progress saved! Total so far: {len(products)}")
         browser.close()
 
-    # Save dated file
+    return save_and_report(products)
+
+
+def save_and_report(products, changes=None, previous_file=None, partial_note=None,
+                    include_notion=True, workers=None):
+    """Save the dated snapshot, diff it against the last run and notify
+
+    Pipeline runs pass in the `changes` they've already collected and the
+    `workers` already delivering their Notion syncs. A `partial_note` marks
+    a failed run: it's added to the report and the partial product list
+    isn't saved as a snapshot, since it would show up as removals next week.
+    """
     date_str = datetime.now().strftime("%Y-%m-%d")
-    if TEST_MODE:
-        dated_filename = f"products_test_{date_str}.json"
-    else:
-        dated_filename = f"products_{date_str}.json"
-    with open(dated_filename, "w") as f:
-        json.dump(products, f, indent=2)
-    
-    # Compare with previous run (not today's file)
-    previous_file = get_previous_file(dated_filename)
-    print(f"Comparing to previous file: {previous_file}")
-    
-    if previous_file:
-        changes = compare_products(previous_file, products)
-    else:
-        changes = {"added": [], "removed": [], "old_count": 0}
-    
+    dated_filename, report_filename = get_dated_filenames(date_str)
+    if partial_note is None:
+        # Save dated file
+        with open(dated_filename, "w") as f:
+            json.dump(products, f, indent=2)
+
+    if changes is None:
+        # Compare with previous run (not today's file)
+        previous_file = get_previous_file(dated_filename)
+        print(f"Comparing to previous file: {previous_file}")
+        if previous_file:
+            changes = compare_products(previous_file, products)
+        else:
+            changes = {"added": [], "removed": [], "old_count": 0}
+
     # Generate report
-    report = generate_report(changes, len(products), date_str)
-    if TEST_MODE:
-        report_filename = f"report_test_{date_str}.txt"
-    else:
-        report_filename = f"report_{date_str}.txt"
+    report = generate_report(changes, len(products), date_str, partial_note)
     with open(report_filename, "w") as f:
         f.write(report)
-    
+
+    # Queue email + Notion in the outbox and deliver them in the background
+    entries = queue_notifications(changes, len(products), date_str, report,
+                                  include_notion=include_notion, partial_note=partial_note)
+    if workers is None:
+        workers = start_outbox_workers()
+    else:
+        workers.extend(start_outbox_workers(entries))
+
+    if partial_note is None:
+        # The search index is a local convenience; don't let it break a run
+        try:
+            update_search_index(dated_filename, previous_file, products)
+        except Exception as e:
+            print(f"Failed to update search index: {e}")
+
     print(f"\n{'='*50}")
-    print(f"DONE! Total products scraped: {len(products)}")
-    print(f"Saved to: {dated_filename}")
+    print(f"{'FAILED' if partial_note else 'DONE'}! Total products scraped: {len(products)}")
+    if partial_note is None:
+        print(f"Saved to: {dated_filename}")
     print(f"Report: {report_filename}")
     print(f"{'='*50}")
     print(report)
 
-    # Send email notification
-    send_email_report(changes, len(products), date_str, report)
+    wait_for_outbox(workers)
+
+    return products
+
+
+def load_sitemap_cache():
+    """Load ETag / Last-Modified and URLs from the previous sitemap fetch"""
+    if not os.path.exists(SITEMAP_CACHE_FILE):
+        return {}
+    with open(SITEMAP_CACHE_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_sitemap_cache(cache):
+    with open(SITEMAP_CACHE_FILE, "w") as f:
+        json.dump(cache, f, indent=2)
+
+
+def fetch_sitemap_document(url, cache):
+    """Fetch one sitemap document, returning its XML or None if unchanged
+
+    Remote sitemaps are requested conditionally with the validators saved
+    in `cache`; local paths are read directly. Gzipped bodies (.xml.gz)
+    are decompressed either way.
+    """
+    if not url.startswith(("http://", "https://")):
+        path = url[len("file://"):] if url.startswith("file://") else url
+        with open(path, "rb") as f:
+            body = f.read()
+    else:
+        headers = {"Accept-Encoding": "gzip"}
+        cached = cache.get(url, {})
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        cache[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        body = response.content
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return body
+
+
+def fetch_sitemap_product_urls(url, cache, depth=0):
+    """Return every product URL listed in a sitemap (or sitemap index)"""
+    body = fetch_sitemap_document(url, cache)
+    if body is None:
+        print(f"  {url}: not modified, using cached URLs")
+        return cache[url].get("urls", [])
 
-    # Add new products to Notion
-    if changes.get('added'):
-        add_to_notion(changes['added'], date_str)
+    root = ET.fromstring(body)
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        if depth >= 2:
+            return []
+        # Only follow the product sitemaps if the index names them
+        children = [loc for loc in locs if "product" in loc.lower()] or locs
+        urls = []
+        for child in children:
+            urls.extend(fetch_sitemap_product_urls(urljoin(url, child), cache, depth + 1))
+    else:
+        urls = [normalize_product_url(loc) for loc in locs if "/product/" in loc]
+    if url in cache:
+        # Remembered for the next run in case the server answers 304
+        cache[url]["urls"] = urls
+    print(f"  {url}: {len(urls)} product URLs")
+    return urls
+
+
+def normalize_product_url(url):
+    if url.startswith("/"):
+        url = BASE_URL + url
+    return url.rstrip("/")
+
+
+def find_product_category(page, url):
+    """Open a product page and work out its category from the breadcrumb
+
+    Returns None if the page fails to load or has no recognisable breadcrumb.
+    """
+    try:
+        page.goto(url, wait_until="networkidle")
+        crumb = page.query_selector('[class*="readcrumb"]')
+        if not crumb:
+            return None
+        text = crumb.inner_text()
+    except Exception as e:
+        print(f"  Error opening {url}: {e}")
+        return None
+    # Check longer names first so the most specific category wins
+    short_names = {name: name.split(" - ", 1)[1] for name in CATEGORIES}
+    for category_name in sorted(short_names, key=lambda name: len(short_names[name]), reverse=True):
+        if short_names[category_name] in text:
+            return category_name
+    return None
+
+
+def discover_changes(old_products):
+    """Diff the sitemap's product URLs against the last snapshot
+
+    Returns (new_urls, missing_urls, affected_categories), or None if the
+    sitemap couldn't be used.
+    """
+    print(f"\nFetching product sitemap: {SITEMAP_URL}")
+    cache = load_sitemap_cache()
+    try:
+        sitemap_urls = set(fetch_sitemap_product_urls(SITEMAP_URL, cache))
+    except Exception as e:
+        print(f"Sitemap discovery failed: {e}")
+        return None
+    if not sitemap_urls:
+        print("Sitemap lists no product URLs.")
+        return None
+    save_sitemap_cache(cache)
+
+    old_by_url = {normalize_product_url(p['url']): p for p in old_products}
+    new_urls = sorted(sitemap_urls - set(old_by_url))
+    missing_urls = sorted(set(old_by_url) - sitemap_urls)
+    affected = {old_by_url[url]['category'] for url in missing_urls}
+    print(f"Sitemap: {len(sitemap_urls)} products, {len(new_urls)} new, {len(missing_urls)} missing")
+    return new_urls, missing_urls, affected
+
+
+def scrape_all_products_discover():
+    """Use the sitemap to find changes, then crawl only affected categories
+
+    New URLs are opened in the browser to find their category; categories
+    with new or missing products are re-crawled and everything else is
+    carried over from the last snapshot. Falls back to a full crawl when
+    there's no previous snapshot, the sitemap can't be read, or a new
+    product's category can't be identified.
+    """
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    dated_filename, _ = get_dated_filenames(date_str)
+    previous_file = get_previous_file(dated_filename)
+    if not previous_file:
+        print("No previous snapshot to compare against, running full crawl.")
+        return scrape_all_products()
+    with open(previous_file, "r") as f:
+        old_products = json.load(f)
+
+    discovered = discover_changes(old_products)
+    if discovered is None:
+        print("Falling back to full crawl.")
+        return scrape_all_products()
+    new_urls, missing_urls, affected = discovered
+    if len(new_urls) > DISCOVER_MAX_NEW_URLS:
+        # Usually means the sitemap's URL format doesn't match the snapshot's
+        print(f"{len(new_urls)} new URLs is more than {DISCOVER_MAX_NEW_URLS}, falling back to full crawl.")
+        return scrape_all_products()
+
+    categories_to_scrape, max_pages = get_categories_to_scrape()
+    products = []
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+
+        for url in new_urls:
+            category_name = find_product_category(page, url)
+            if category_name is None:
+                print(f"  Couldn't find category for {url}, crawling all categories")
+                affected = set(categories_to_scrape)
+                break
+            print(f"  New: {url} -> {category_name}")
+            affected.add(category_name)
+
+        print(f"\nCategories to crawl: {len(affected & set(categories_to_scrape))}/{len(categories_to_scrape)}")
+        crawled = {}
+
+        def crawl(category_names):
+            for category_name in category_names:
+                crawled[category_name] = []
+                count = scrape_category(page, category_name, categories_to_scrape[category_name],
+                                        crawled[category_name], max_pages=max_pages)
+                print(f"  {category_name}: {count} products")
+                with open("products.json", "w") as f:
+                    json.dump([prod for prods in crawled.values() for prod in prods], f, indent=2)
+
+        crawl([name for name in categories_to_scrape if name in affected])
+
+        # A breadcrumb can point at the wrong category; make sure every new
+        # product was actually found before carrying the rest over
+        found = {normalize_product_url(prod['url']) for prods in crawled.values() for prod in prods}
+        not_found = set(new_urls) - found
+        if not_found:
+            print(f"  {len(not_found)} new product(s) not in the crawled categories, crawling the rest")
+            crawl([name for name in categories_to_scrape if name not in crawled])
+            found = {normalize_product_url(prod['url']) for prods in crawled.values() for prod in prods}
+            for url in sorted(set(new_urls) - found):
+                print(f"  Warning: {url} is in the sitemap but not in any category listing")
+        browser.close()
+
+    for category_name in categories_to_scrape:
+        if category_name in crawled:
+            products.extend(crawled[category_name])
+        else:
+            carried = [prod for prod in old_products if prod['category'] == category_name]
+            products.extend(carried)
+            print(f"  {category_name}: unchanged, kept {len(carried)} products")
+
+    with open("products.json", "w") as f:
+        json.dump(products, f, indent=2)
+    return save_and_report(products)
+
+
+def build_category_index(products):
+    """Index a snapshot as {category: {url: product}}"""
+    index = {}
+    for p in products:
+        index.setdefault(p.get('category', 'Unknown'), {})[p['url']] = p
+    return index
+
+
+def diff_category(category_name, category_products, old_index, old_urls):
+    """Diff one freshly crawled category against the previous snapshot"""
+    old_products = old_index.get(category_name, {})
+    new_urls = {p['url'] for p in category_products}
+    # A product that moved category isn't new, so check against every old URL
+    added = [p for p in category_products if p['url'] not in old_urls]
+    removed = [p for url, p in old_products.items() if url not in new_urls]
+    return {"category": category_name, "added": added, "removed": removed}
+
+
+def drop_moved_products(removed, products):
+    """Products that only moved between categories aren't removed"""
+    new_urls = {p['url'] for p in products}
+    return [p for p in removed if p['url'] not in new_urls]
+
+
+def _change_event_consumer(events, changes, date_str, workers):
+    """Collect per-category change events and sync new products to Notion"""
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        print(f"  [pipeline] {event['category']}: +{len(event['added'])} / -{len(event['removed'])}")
+        changes['added'].extend(event['added'])
+        changes['removed'].extend(event['removed'])
+        if event['added']:
+            entries = queue_notifications({"added": event['added']}, 0, date_str, None,
+                                          include_email=False)
+            workers.extend(start_outbox_workers(entries))
+
+
+def scrape_all_products_pipeline():
+    """Crawl and diff category by category, syncing changes as they're found
+
+    Each category is diffed against the previous snapshot as soon as it's
+    crawled; new products go to Notion while the crawl continues. If the
+    crawl fails part way, the changes already found are still reported.
+    """
+    products = []
+    categories_to_scrape, max_pages = get_categories_to_scrape()
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    dated_filename, _ = get_dated_filenames(date_str)
 
+    previous_file = get_previous_file(dated_filename)
+    print(f"Comparing to previous file: {previous_file}")
+    old_products = []
+    if previous_file:
+        with open(previous_file, 'r') as f:
+            old_products = json.load(f)
+    old_index = build_category_index(old_products)
+    old_urls = {p['url'] for p in old_products}
+
+    # Retry anything left over from earlier runs while we crawl
+    workers = start_outbox_workers()
+
+    changes = {"added": [], "removed": [], "old_count": len(old_products)}
+    events = queue.Queue()
+    consumer = threading.Thread(target=_change_event_consumer,
+                                args=(events, changes, date_str, workers))
+    consumer.start()
+
+    crawled = 0
+    error = None
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            page = browser.new_page()
+            for category_name, category_id in categories_to_scrape.items():
+                category_products = []
+                count = scrape_category(page, category_name, category_id, category_products, max_pages=max_pages)
+                products.extend(category_products)
+                print(f"  {category_name}: {count} products")
+                with open("products.json", "w") as f:
+                    json.dump(products, f, indent=2)
+                print(f"  Progress saved! Total so far: {len(products)}")
+                if previous_file:
+                    events.put(diff_category(category_name, category_products, old_index, old_urls))
+                crawled += 1
+            browser.close()
+    except Exception as e:
+        error = e
+        print(f"\nCrawl failed after {crawled}/{len(categories_to_scrape)} categories: {e}")
+    finally:
+        events.put(None)
+        consumer.join()
+
+    changes['removed'] = drop_moved_products(changes['removed'], products)
+
+    partial_note = None
+    if error:
+        partial_note = (f"run failed after {crawled} of {len(categories_to_scrape)} categories; "
+                        f"changes below cover the crawled categories only.")
+    save_and_report(products, changes=changes, previous_file=previous_file,
+                    partial_note=partial_note, include_notion=False, workers=workers)
+
+    if error:
+        raise error
     return products
 
+
+def tokenize(text):
+    # Keep decimals like "2.5" (tonnage, SEER) as one token
+    return re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", (text or "").lower())
+
+
+def snapshot_date(filename):
+    """'products_2026-03-23.json' -> '2026-03-23'"""
+    return filename[:-len(".json")].rsplit("_", 1)[-1]
+
+
+def _index_product(index, product, first_seen):
+    url = product['url']
+    index["products"][url] = dict(product, first_seen=first_seen)
+    for token in set(tokenize(product.get('name'))):
+        if token not in index["tokens"]:
+            index["tokens"][token] = []
+            bisect.insort(index["sorted_tokens"], token)
+        index["tokens"][token].append(url)
+    for field in ("item_code", "mfr_code"):
+        code = product.get(field, "").upper()
+        if code:
+            bisect.insort(index[field + "s"], [code, url])
+
+
+def _unindex_product(index, url):
+    product = index["products"].pop(url, None)
+    if product is None:
+        return
+    for token in set(tokenize(product.get('name'))):
+        urls = index["tokens"].get(token, [])
+        if url in urls:
+            urls.remove(url)
+        if not urls and token in index["tokens"]:
+            del index["tokens"][token]
+            i = bisect.bisect_left(index["sorted_tokens"], token)
+            if i < len(index["sorted_tokens"]) and index["sorted_tokens"][i] == token:
+                del index["sorted_tokens"][i]
+    for field in ("item_code", "mfr_code"):
+        entry = [product.get(field, "").upper(), url]
+        table = index[field + "s"]
+        i = bisect.bisect_left(table, entry)
+        if i < len(table) and table[i] == entry:
+            del table[i]
+
+
+def save_search_index(index):
+    tmp_file = SEARCH_INDEX_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, SEARCH_INDEX_FILE)
+
+
+def build_search_index():
+    """Build the search index from scratch over the latest snapshot
+
+    Every snapshot is read once to work out the date each product was
+    first seen; only products in the latest snapshot are indexed. First-seen
+    dates are kept for every URL ever seen, so a product that comes back
+    after being removed keeps its original date.
+    """
+    files = list_snapshot_files()
+    index = {"version": SEARCH_INDEX_VERSION, "snapshot": None, "products": {}, "first_seen": {},
+             "tokens": {}, "sorted_tokens": [], "item_codes": [], "mfr_codes": []}
+    if not files:
+        return index
+    first_seen = index["first_seen"]
+    for filename in files:
+        with open(filename, "r") as f:
+            for product in json.load(f):
+                first_seen.setdefault(product['url'], snapshot_date(filename))
+    with open(files[-1], "r") as f:
+        latest = json.load(f)
+    for product in latest:
+        if product['url'] not in index["products"]:
+            _index_product(index, product, first_seen[product['url']])
+    index["snapshot"] = files[-1]
+    save_search_index(index)
+    print(f"Search index built from {files[-1]}: {len(index['products'])} products")
+    return index
+
+
+def load_search_index():
+    """Load the search index, building it if it's missing or out of date"""
+    files = list_snapshot_files()
+    if os.path.exists(SEARCH_INDEX_FILE):
+        with open(SEARCH_INDEX_FILE, "r") as f:
+            index = json.load(f)
+        if (files and index.get("version") == SEARCH_INDEX_VERSION
+                and index.get("snapshot") == files[-1]):
+            return index
+    return build_search_index()
+
+
+def update_search_index(snapshot_file, previous_file, products):
+    """Bring the search index up to date with a new snapshot without rebuilding it
+
+    Added and removed products are (un)indexed, and products whose name,
+    codes or category changed are re-indexed, keeping their first-seen date.
+    """
+    index = None
+    if previous_file and os.path.exists(SEARCH_INDEX_FILE):
+        with open(SEARCH_INDEX_FILE, "r") as f:
+            index = json.load(f)
+        if index.get("version") != SEARCH_INDEX_VERSION or index.get("snapshot") != previous_file:
+            index = None
+    if index is None:
+        build_search_index()
+        return
+
+    latest = {}
+    for product in products:
+        latest.setdefault(product['url'], product)
+    removed = [url for url in index["products"] if url not in latest]
+    for url in removed:
+        _unindex_product(index, url)
+    added = changed = 0
+    for url, product in latest.items():
+        indexed = index["products"].get(url)
+        if indexed is None:
+            first_seen = index["first_seen"].setdefault(url, snapshot_date(snapshot_file))
+            _index_product(index, product, first_seen)
+            added += 1
+        elif any(indexed.get(f) != product.get(f) for f in SEARCH_INDEX_FIELDS):
+            _unindex_product(index, url)
+            _index_product(index, product, indexed["first_seen"])
+            changed += 1
+    index["snapshot"] = snapshot_file
+    save_search_index(index)
+    print(f"Search index updated: +{added} / -{len(removed)} / {changed} changed")
+
+
+def _prefix_matches(table, prefix):
+    """URLs whose code starts with `prefix` in a sorted [code, url] table"""
+    i = bisect.bisect_left(table, [prefix, ""])
+    while i < len(table) and table[i][0].startswith(prefix):
+        yield table[i][0], table[i][1]
+        i += 1
+
+
+def search_products(index, query, category=None, since=None, limit=20):
+    """Rank products in the index against a query
+
+    Item and MFR codes score highest on an exact match, then on a prefix
+    match; each query word found in a product name adds to its score
+    (whole words count more than word prefixes).
+    """
+    scores = {}
+
+    def add(url, points):
+        scores[url] = scores.get(url, 0) + points
+
+    code = query.strip().upper()
+    if code:
+        for table in (index["item_codes"], index["mfr_codes"]):
+            for matched, url in _prefix_matches(table, code):
+                add(url, 100 if matched == code else 50)
+
+    tokens = index["sorted_tokens"]
+    for word in set(tokenize(query)):
+        for url in index["tokens"].get(word, []):
+            add(url, 10)
+        i = bisect.bisect_left(tokens, word)
+        while i < len(tokens) and tokens[i].startswith(word):
+            if tokens[i] != word:
+                for url in index["tokens"][tokens[i]]:
+                    add(url, 3)
+            i += 1
+
+    results = []
+    for url, score in scores.items():
+        product = index["products"][url]
+        if category and category.lower() not in product['category'].lower():
+            continue
+        if since and product['first_seen'] < since:
+            continue
+        results.append((score, product))
+    results.sort(key=lambda r: (-r[0], r[1]['name']))
+    return results[:limit]
+
+
+def search_command(args):
+    """`python scraper.py search <query> [--category NAME] [--since DATE] [--limit N]`"""
+    terms = []
+    options = {"--category": None, "--since": None, "--limit": "20"}
+    i = 0
+    while i < len(args):
+        if args[i] in options and i + 1 < len(args):
+            options[args[i]] = args[i + 1]
+            i += 2
+        elif args[i] == "--test":
+            i += 1
+        else:
+            terms.append(args[i])
+            i += 1
+    query = " ".join(terms)
+    usage = "Usage: python scraper.py search <query> [--category NAME] [--since YYYY-MM-DD] [--limit N]"
+    if not query:
+        print(usage)
+        return False
+    try:
+        limit = int(options["--limit"])
+        if limit < 1:
+            raise ValueError
+        if options["--since"]:
+            datetime.strptime(options["--since"], "%Y-%m-%d")
+    except ValueError:
+        print(f"Invalid --limit or --since value.\n{usage}")
+        return False
+
+    start = time.time()
+    index = load_search_index()
+    results = search_products(index, query, category=options["--category"],
+                              since=options["--since"], limit=limit)
+    elapsed = (time.time() - start) * 1000
+
+    print(f"{len(results)} result(s) for '{query}' in {index['snapshot']} ({elapsed:.0f} ms)")
+    for score, p in results:
+        print(f"  {p['name'][:70]}")
+        print(f"    Item: {p['item_code']} | MFR: {p['mfr_code']} | {p['category']} | since {p['first_seen']}")
+        print(f"    {p['url']}")
+    return bool(results)
+
+
 def test_email_with_fake_products():
     """Test the email functionality with simulated new products"""
     print("\n" + "="*50)
@@ -595,6 +1449,11 @@ Usage:
   python scraper.py              Full scrape (all categories, all pages)
   python scraper.py --test       Quick test (2 categories, 1 page each)
   python scraper.py --test-email Test email & Notion with fake products (no scraping)
+  python scraper.py --pipeline   Full scrape, diffing and syncing each category as it finishes
+  python scraper.py --discover   Use the product sitemap to crawl only categories that changed
+  python scraper.py notify --drain  Retry email/Notion deliveries left in outbox.json
+  python scraper.py search <query> [--category NAME] [--since YYYY-MM-DD] [--limit N]
+                                 Search the latest snapshot by item code, MFR code or name
 
 Environment variables:
   EMAIL_USER        Gmail address to send from
@@ -602,11 +1461,28 @@ Environment variables:
   EMAIL_TO          Recipient email (defaults to EMAIL_USER)
   NOTION_API_KEY    Notion integration secret
   NOTION_DATABASE_ID  Notion database ID (optional, has default)
+  SITEMAP_URL       Sitemap for --discover (URL or local file, defaults to the site's sitemap.xml)
 
 Test mode creates separate files (products_test_*.json) so you can
 run it multiple times to verify the comparison and email work.
+
+Email and Notion deliveries are queued in outbox.json and sent in the
+background with retries. Anything not delivered within a minute of
+the scrape finishing stays in the outbox and is retried by the next
+run or by `notify --drain`.
 """)
+    elif SEARCH_MODE:
+        sys.exit(0 if search_command(sys.argv[2:]) else 1)
+    elif NOTIFY_COMMAND:
+        if "--drain" not in sys.argv:
+            print("Usage: python scraper.py notify --drain")
+            sys.exit(1)
+        sys.exit(0 if drain_outbox() else 1)
     elif TEST_EMAIL:
         test_email_with_fake_products()
+    elif DISCOVER_MODE:
+        scrape_all_products_discover()
+    elif PIPELINE_MODE:
+        scrape_all_products_pipeline()
     else:
         scrape_all_products()
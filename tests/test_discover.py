@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+# scraper.py imports these at module level
+pytest.importorskip("requests")
+pytest.importorskip("playwright")
+
+import scraper
+
+FIXTURE_SITEMAP = os.path.join(os.path.dirname(__file__), "..", "fixtures", "sitemap", "sitemap_index.xml")
+PRODUCT = "https://www.carrierenterprise.com/product/"
+
+OLD_SNAPSHOT = [
+    {"name": "2.5 Ton AC", "item_code": "GA5SAN53000W", "mfr_code": "GA5SAN53000W",
+     "url": PRODUCT + "1604089257118724", "category": "Residential - Air Conditioners"},
+    {"name": "3 Ton AC", "item_code": "GA5SAN53600W", "mfr_code": "GA5SAN53600W",
+     "url": PRODUCT + "1604089257118822", "category": "Residential - Air Conditioners"},
+    {"name": "1.5 Ton Heat Pump", "item_code": "GH5SAN51800A", "mfr_code": "GH5SAN51800A",
+     "url": PRODUCT + "1604089243320736", "category": "Residential - Heat Pumps"},
+    {"name": "1.5 Ton AC", "item_code": "GA5SAN41800W", "mfr_code": "GA5SAN41800W",
+     "url": PRODUCT + "1604089113546841", "category": "Residential - Air Conditioners"},
+]
+
+
+@pytest.fixture
+def fixture_sitemap(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "SITEMAP_URL", os.path.abspath(FIXTURE_SITEMAP))
+    monkeypatch.setattr(scraper, "SITEMAP_CACHE_FILE", str(tmp_path / "sitemap_cache.json"))
+
+
+def test_discover_changes_from_fixture_sitemap(fixture_sitemap):
+    new_urls, missing_urls, affected = scraper.discover_changes(OLD_SNAPSHOT)
+
+    assert new_urls == [PRODUCT + "9999999999999999"]
+    assert missing_urls == [PRODUCT + "1604089113546841"]
+    assert affected == {"Residential - Air Conditioners"}
+
+
+def test_unmodified_remote_sitemap_uses_cached_urls(monkeypatch):
+    url = "https://www.carrierenterprise.com/sitemap-products.xml"
+    cache = {url: {"etag": '"abc"', "last_modified": None, "urls": [PRODUCT + "1"]}}
+    sent = {}
+
+    class NotModified:
+        status_code = 304
+
+    def fake_get(request_url, headers, timeout):
+        sent.update(headers)
+        return NotModified()
+
+    monkeypatch.setattr(scraper.requests, "get", fake_get)
+
+    assert scraper.fetch_sitemap_product_urls(url, cache) == [PRODUCT + "1"]
+    assert sent["If-None-Match"] == '"abc"'
+
+
+class FakePage:
+    def __init__(self, breadcrumb=None, error=None):
+        self.breadcrumb = breadcrumb
+        self.error = error
+
+    def goto(self, url, wait_until):
+        if self.error:
+            raise self.error
+
+    def query_selector(self, selector):
+        if self.breadcrumb is None:
+            return None
+        crumb = type("Crumb", (), {"inner_text": lambda _: self.breadcrumb})
+        return crumb()
+
+
+def test_find_product_category_from_breadcrumb():
+    page = FakePage("Home / Commercial / Commercial Accessories")
+    assert scraper.find_product_category(page, PRODUCT + "1") == "Commercial - Commercial Accessories"
+
+
+@pytest.mark.parametrize("page", [FakePage(None), FakePage(error=TimeoutError("timed out"))])
+def test_find_product_category_unknown(page):
+    assert scraper.find_product_category(page, PRODUCT + "1") is None
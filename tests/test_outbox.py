@@ -0,0 +1,104 @@
+import json
+import threading
+
+import pytest
+
+# scraper.py imports these at module level
+pytest.importorskip("requests")
+pytest.importorskip("playwright")
+
+import scraper
+
+PRODUCT = "https://www.carrierenterprise.com/product/"
+
+
+def product(n):
+    return {"name": f"Product {n}", "item_code": f"ITEM{n}", "mfr_code": f"MFR{n}",
+            "url": PRODUCT + str(n), "category": "Residential - Heat Pumps"}
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, "OUTBOX_FILE", "outbox.json")
+    monkeypatch.setattr(scraper, "NOTION_SYNCED_FILE", "notion_synced.json")
+    monkeypatch.setattr(scraper, "NOTION_API_KEY", "secret")
+    monkeypatch.setattr(scraper, "OUTBOX_RETRY_DELAY", 0)
+    monkeypatch.setattr(scraper.time, "sleep", lambda seconds: None)
+
+
+def fake_post(posted, fail_urls=(), block=None):
+    def post(url, headers, json, timeout):
+        page_url = json["properties"]["URL"]["url"]
+        posted.append(page_url)
+        if block is not None and len(posted) > 1:
+            block.wait()
+        return FakeResponse(500 if page_url in fail_urls else 200)
+    return post
+
+
+def synced_urls():
+    with open("notion_synced.json") as f:
+        return set(json.load(f))
+
+
+def test_partial_notion_failure_keeps_only_failed_products(outbox, monkeypatch):
+    posted = []
+    monkeypatch.setattr(scraper.requests, "post", fake_post(posted, fail_urls={PRODUCT + "2"}))
+    scraper.enqueue_notification("notion", {"products": [product(1), product(2), product(3)],
+                                            "date_str": "2026-03-23"})
+
+    assert scraper.drain_outbox() is False
+
+    # 1 and 3 go out once; 2 is retried on its own until attempts run out
+    assert posted == [PRODUCT + "1", PRODUCT + "2", PRODUCT + "3"] + [PRODUCT + "2"] * 2
+    (entry,) = scraper.load_outbox()
+    assert [p["url"] for p in entry["payload"]["products"]] == [PRODUCT + "2"]
+    assert entry["attempts"] == scraper.OUTBOX_MAX_ATTEMPTS
+    assert synced_urls() == {PRODUCT + "1", PRODUCT + "3"}
+
+
+def test_timeout_leaves_entry_and_records_products_already_added(outbox, monkeypatch):
+    posted = []
+    block = threading.Event()
+    monkeypatch.setattr(scraper.requests, "post", fake_post(posted, block=block))
+    scraper.enqueue_notification("notion", {"products": [product(1), product(2), product(3)],
+                                            "date_str": "2026-03-23"})
+
+    workers = scraper.start_outbox_workers()
+    try:
+        assert scraper.wait_for_outbox(workers, timeout=0.5) is False
+        assert len(scraper.load_outbox()) == 1
+        assert synced_urls() == {PRODUCT + "1"}
+        # What a run that exits here leaves behind
+        left_behind = {name: open(name).read() for name in ("outbox.json", "notion_synced.json")}
+    finally:
+        block.set()
+        for t in workers:
+            t.join()
+    for name, content in left_behind.items():
+        with open(name, "w") as f:
+            f.write(content)
+
+    # The next run only adds the products that don't have a page yet
+    posted.clear()
+    monkeypatch.setattr(scraper.requests, "post", fake_post(posted))
+    assert scraper.drain_outbox() is True
+    assert posted == [PRODUCT + "2", PRODUCT + "3"]
+    assert scraper.load_outbox() == []
+
+
+def test_missing_api_key_keeps_payload(outbox, monkeypatch):
+    monkeypatch.setattr(scraper, "NOTION_API_KEY", None)
+    scraper.enqueue_notification("notion", {"products": [product(1)], "date_str": "2026-03-23"})
+
+    assert scraper.drain_outbox() is False
+
+    (entry,) = scraper.load_outbox()
+    assert entry["payload"]["products"] == [product(1)]
@@ -0,0 +1,49 @@
+import pytest
+
+# scraper.py imports these at module level
+pytest.importorskip("requests")
+pytest.importorskip("playwright")
+
+import scraper
+
+PRODUCT = "https://www.carrierenterprise.com/product/"
+AC = "Residential - Air Conditioners"
+HP = "Residential - Heat Pumps"
+
+
+def product(n, category):
+    return {"name": f"Product {n}", "item_code": f"ITEM{n}", "mfr_code": f"MFR{n}",
+            "url": PRODUCT + str(n), "category": category}
+
+
+OLD_SNAPSHOT = [product(1, AC), product(2, AC), product(3, HP)]
+
+
+def test_diff_category_against_previous_snapshot():
+    old_index = scraper.build_category_index(OLD_SNAPSHOT)
+    old_urls = {p["url"] for p in OLD_SNAPSHOT}
+
+    event = scraper.diff_category(AC, [product(1, AC), product(4, AC)], old_index, old_urls)
+
+    assert event["category"] == AC
+    assert event["added"] == [product(4, AC)]
+    assert event["removed"] == [product(2, AC)]
+
+
+def test_product_moved_between_categories_is_neither_added_nor_removed():
+    old_index = scraper.build_category_index(OLD_SNAPSHOT)
+    old_urls = {p["url"] for p in OLD_SNAPSHOT}
+    # Product 2 moves from Air Conditioners to Heat Pumps
+    crawled = {AC: [product(1, AC)], HP: [product(2, HP), product(3, HP)]}
+
+    added, removed, products = [], [], []
+    for category_name, category_products in crawled.items():
+        event = scraper.diff_category(category_name, category_products, old_index, old_urls)
+        added.extend(event["added"])
+        removed.extend(event["removed"])
+        products.extend(category_products)
+
+    assert added == []
+    # Looks removed from its old category until the new one has been crawled
+    assert removed == [product(2, AC)]
+    assert scraper.drop_moved_products(removed, products) == []
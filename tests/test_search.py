@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+# scraper.py imports these at module level
+pytest.importorskip("requests")
+pytest.importorskip("playwright")
+
+import scraper
+
+PRODUCT = "https://www.carrierenterprise.com/product/"
+
+
+def product(n, name, item_code, category="Residential - Heat Pumps"):
+    return {"name": name, "item_code": item_code, "mfr_code": "M" + item_code,
+            "url": PRODUCT + str(n), "category": category}
+
+
+def write_snapshot(filename, products):
+    with open(filename, "w") as f:
+        json.dump(products, f)
+
+
+def test_incremental_update_matches_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, "TEST_MODE", False)
+    write_snapshot("products_2026-03-02.json", [
+        product(5, "5 Ton Heat Pump", "GH5SAN56000A"),
+    ])
+    write_snapshot("products_2026-03-09.json", [
+        product(1, "3 Ton Heat Pump", "GH5SAN53600A"),
+        product(2, "2 Ton Heat Pump", "GH5SAN52400A"),
+        product(3, "80K BTU Gas Furnace", "FURN80", "Residential - Gas Furnaces"),
+    ])
+    scraper.build_search_index()
+
+    new = [
+        product(1, "3 Ton 14.3 SEER2 Heat Pump", "GH5SAN53600A"),  # renamed
+        product(2, "2 Ton Heat Pump", "GH6SAN52400A"),  # code changed
+        product(4, "4 Ton Heat Pump", "GH5SAN54800A"),  # added
+        product(5, "5 Ton Heat Pump", "GH5SAN56000A"),  # back after being removed
+    ]
+    write_snapshot("products_2026-03-23.json", new)
+    scraper.update_search_index("products_2026-03-23.json", "products_2026-03-09.json", new)
+
+    with open(scraper.SEARCH_INDEX_FILE) as f:
+        updated = json.load(f)
+    rebuilt = scraper.build_search_index()
+    for key in ("snapshot", "products", "first_seen", "sorted_tokens", "item_codes", "mfr_codes"):
+        assert updated[key] == rebuilt[key]
+
+    results = scraper.search_products(updated, "GH6SAN")
+    assert [p["url"] for _, p in results] == [PRODUCT + "2"]
+    assert scraper.search_products(updated, "furnace") == []
+    since = scraper.search_products(updated, "heat pump", since="2026-03-23")
+    assert [p["url"] for _, p in since] == [PRODUCT + "4"]
+    assert updated["products"][PRODUCT + "5"]["first_seen"] == "2026-03-02"
+
+
+def test_search_index_failure_does_not_block_notifications(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, "TEST_MODE", False)
+    queued = []
+    monkeypatch.setattr(scraper, "queue_notifications", lambda *args, **kwargs: queued.append(args) or [])
+    monkeypatch.setattr(scraper, "wait_for_outbox", lambda workers: True)
+
+    def broken_index(*args):
+        raise ValueError("corrupt snapshot")
+
+    monkeypatch.setattr(scraper, "update_search_index", broken_index)
+
+    scraper.save_and_report([product(1, "3 Ton Heat Pump", "GH5SAN53600A")])
+
+    assert len(queued) == 1